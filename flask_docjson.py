@@ -9,13 +9,18 @@
     :license: BSD, see LICENSE for more details.
 """
 
-import ctypes
 from functools import wraps
 import json
+import re
 import sys
+import weakref
 
-from flask import request, Response
-from ply import lex, yacc
+from flask import json as flask_json, request, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 __version__ = '0.1.7'
 
@@ -28,22 +33,28 @@ if sys.version_info.major == 3:
     basestring = (str, bytes)
     unicode = str
     long = int
+    integer_types = (int,)
+    intern = sys.intern
 
-    def json_loads(data):
-        if isinstance(data, bytes):
-            data = str(data, 'utf8')
-        return json.loads(data)
-
-    def get_func_code(func):
-        return func.__code__
+    if sys.version_info >= (3, 6):  # json.loads accepts bytes
+        json_loads = json.loads
+    else:
+        def json_loads(data):
+            if isinstance(data, bytes):
+                data = str(data, 'utf8')
+            return json.loads(data)
 
 else:
+    integer_types = (int, long)
+    _builtin_intern = intern  # noqa
+
+    def intern(s):  # Python 2 can't intern unicode strings
+        return _builtin_intern(s) if isinstance(s, str) else s
 
-    def json_loads(data):
-        return json.loads(data)
+    json_loads = json.loads
 
-    def get_func_code(func):
-        return func.func_code
+if orjson is not None:  # Optional faster json decoder, accepts bytes
+    json_loads = orjson.loads  # noqa
 
 
 ###
@@ -72,12 +83,17 @@ class GrammarError(ParserError):
 class ValidationError(Error):
     """A validation error occurred."""
 
+    __slots__ = ('code', 'reason', 'value', 'key')
+
     def __init__(self, code=None, reason=None, value=None, key=None):
         self.code = code
         self.reason = reason
         self.value = value
         self.key = key
 
+    def __reduce__(self):
+        return self.__class__, (self.code, self.reason, self.value, self.key)
+
     def __str__(self):
         try:
             return 'ValidationError: {0}, {1}, {2} => {3}'.format(
@@ -163,423 +179,324 @@ M_PATCH = 5
 M_HEAD = 6
 M_OPTIONS = 7
 
+_METHOD_TAGS = {
+    'POST': M_POST,
+    'GET': M_GET,
+    'PUT': M_PUT,
+    'DELETE': M_DELETE,
+    'PATCH': M_PATCH,
+    'HEAD': M_HEAD,
+    'OPTIONS': M_OPTIONS,
+}
+
+_METHOD_BITS = dict((name, 1 << tag) for name, tag in _METHOD_TAGS.items())
+
+_U8_HI = 0xff
+_U16_HI = 0xffff
+_U32_HI = 0xffffffff
+_U64_HI = 0xffffffffffffffff
+_I8_LO, _I8_HI = -0x80, 0x7f
+_I16_LO, _I16_HI = -0x8000, 0x7fff
+_I32_LO, _I32_HI = -0x80000000, 0x7fffffff
+_I64_LO, _I64_HI = -0x8000000000000000, 0x7fffffffffffffff
+
+_INT_BOUNDS = {  # type => (lo, hi, accepted python types)
+    T_U8: (0, _U8_HI, frozenset([int])),
+    T_U16: (0, _U16_HI, frozenset([int])),
+    T_U32: (0, _U32_HI, frozenset([int])),
+    T_U64: (0, _U64_HI, frozenset(integer_types)),
+    T_I8: (_I8_LO, _I8_HI, frozenset([int])),
+    T_I16: (_I16_LO, _I16_HI, frozenset([int])),
+    T_I32: (_I32_LO, _I32_HI, frozenset([int])),
+    T_I64: (_I64_LO, _I64_HI, frozenset(integer_types)),
+}
+
 
 ###
 # Lexer
 ###
 
-literals = ':,()[]{}/<>*'
-
-t_ignore = ' \t\r'   # whitespace
-
-tokens = (
-    'POST',
-    'GET',
-    'PUT',
-    'DELETE',
-    'PATCH',
-    'HEAD',
-    'OPTIONS',
-    'ELLIPSIS',
-    'BOOL',
-    'U8',
-    'U16',
-    'U32',
-    'U64',
-    'I8',
-    'I16',
-    'I32',
-    'I64',
-    'FLOAT',
-    'STRING',
-    'IDENTIFIER',
-    'STATIC_ROUTE',
-    'STATUS_CODE_MATCHER',
-    'LITERAL_INTEGER',
-    'LITERAL_STRING',
-)
-
-
-def t_error(t):
-    raise _InternalLexerError('illegal char %r at line %d' % (t.value[0],
-                                                              t.lineno))
-
-
-def t_ignore_COMMENT(t):
-    r'\/\/[^\n]*'
-
-
-def t_newline(t):
-    r'\n+'
-    t.lexer.lineno += len(t.value)
-
-
-def t_POST(t):
-    r'POST'
-    t.value = M_POST
-    return t
-
-
-def t_GET(t):
-    r'GET'
-    t.value = M_GET
-    return t
-
-
-def t_PUT(t):
-    r'PUT'
-    t.value = M_PUT
-    return t
-
-
-def t_DELETE(t):
-    r'DELETE'
-    t.value = M_DELETE
-    return t
-
-
-def t_HEAD(t):
-    r'HEAD'
-    t.value = M_HEAD
-    return t
-
-
-def t_OPTIONS(t):
-    r'OPTIONS'
-    t.value = M_OPTIONS
-    return
-
-
-def t_ELLIPSIS(t):
-    r'\.\.\.'
-    t.value = S_ELLIPSIS
-    return t
-
-
-def t_PATCH(t):
-    r'PATCH'
-    t.value = M_PATCH
-    return t
-
-
-def t_BOOL(t):
-    r'bool'
-    t.value = T_BOOL
-    return t
-
-
-def t_U8(t):
-    r'u8'
-    t.value = T_U8
-    return t
-
-
-def t_U16(t):
-    r'u16'
-    t.value = T_U16
-    return t
-
-
-def t_U32(t):
-    r'u32'
-    t.value = T_U32
-    return t
-
-
-def t_U64(t):
-    r'u64'
-    t.value = T_U64
-    return t
-
-
-def t_I8(t):
-    r'i8'
-    t.value = T_I8
-    return t
-
-
-def t_I16(t):
-    r'i16'
-    t.value = T_I16
-    return t
-
-
-def t_I32(t):
-    r'i32'
-    t.value = T_I32
-    return t
-
-
-def t_I64(t):
-    r'i64'
-    t.value = T_I64
-    return t
-
-
-def t_FLOAT(t):
-    r'float'
-    t.value = T_FLOAT
-    return t
+_KEYWORDS = {
+    'POST': ('METHOD', M_POST),
+    'GET': ('METHOD', M_GET),
+    'PUT': ('METHOD', M_PUT),
+    'DELETE': ('METHOD', M_DELETE),
+    'PATCH': ('METHOD', M_PATCH),
+    'HEAD': ('METHOD', M_HEAD),
+    'OPTIONS': ('METHOD', M_OPTIONS),
+    'bool': ('TYPE', T_BOOL),
+    'u8': ('TYPE', T_U8),
+    'u16': ('TYPE', T_U16),
+    'u32': ('TYPE', T_U32),
+    'u64': ('TYPE', T_U64),
+    'i8': ('TYPE', T_I8),
+    'i16': ('TYPE', T_I16),
+    'i32': ('TYPE', T_I32),
+    'i64': ('TYPE', T_I64),
+    'float': ('TYPE', T_FLOAT),
+    'string': ('STRING', T_STRING),
+}
+
+_ESCAPES = {
+    't': '\t',
+    'r': '\r',
+    'n': '\n',
+    '\\': '\\',
+    '"': '\"'
+}
+
+
+_ESCAPE_RE = re.compile(r'\\(.)')
+
+
+def _unescape(s, lineno):
+    if '\\' not in s:
+        return s
+
+    def replace(m):
+        ch = m.group(1)
+        if ch not in _ESCAPES:
+            raise _InternalLexerError('unsupported escaping char %r at '
+                                      'line %d' % (ch, lineno))
+        return _ESCAPES[ch]
+    return _ESCAPE_RE.sub(replace, s)
+
+
+class Tokenizer(object):
+    """Split schema string into a list of ``(kind, value, text, lineno)``
+    tokens, the last one is always an ``EOF`` token.
+    """
 
+    regex = re.compile(r'''
+        (?P<WS>[ \t\r\n]+)
+      | (?P<COMMENT>//[^\n]*)
+      | (?P<ELLIPSIS>\.\.\.)
+      | (?P<STATUS_CODE_MATCHER>[0-9]+X+)
+      | (?P<LITERAL_INTEGER>[+-]?[0-9]+)
+      | (?P<LITERAL_STRING>"(?:[^"\\\n]|\\.)*")
+      | (?P<STATIC_ROUTE>\B/[^<{\r\n\s]*)
+      | (?P<IDENTIFIER>[a-zA-Z_][a-zA-Z0-9_]*)
+      | (?P<LITERAL>[:,()\[\]{}/<>*])
+      | (?P<MISMATCH>.)
+    ''', re.VERBOSE)
+
+    def __init__(self, data):
+        self.data = data
+
+    def tokenize(self):
+        tokens = []
+        lineno = 1
+        for m in self.regex.finditer(self.data):
+            kind = m.lastgroup
+            text = m.group()
+            if kind == 'WS':
+                lineno += text.count('\n')
+                continue
+            elif kind == 'COMMENT':
+                continue
+            elif kind == 'IDENTIFIER':
+                kind, value = _KEYWORDS.get(text, (kind, text))
+            elif kind == 'LITERAL':
+                kind = value = text
+            elif kind == 'ELLIPSIS':
+                value = S_ELLIPSIS
+            elif kind == 'LITERAL_INTEGER':
+                value = int(text)
+            elif kind == 'LITERAL_STRING':
+                value = _unescape(text[1:-1], lineno)
+            elif kind == 'MISMATCH':
+                raise _InternalLexerError('illegal char %r at line %d' % (
+                    text, lineno))
+            else:
+                value = text
+            tokens.append((kind, value, text, lineno))
+        tokens.append(('EOF', None, '', lineno))
+        return tokens
 
-def t_STRING(t):
-    r'string'
-    t.value = T_STRING
-    return t
 
+###
+# Parser
+###
 
-def t_IDENTIFIER(t):
-    r'[a-zA-Z_][a-zA-Z0-9_]*'
-    return t
+_LEAF_TYPES = {}  # (type, arg) => shared leaf type tuple
 
 
-def t_STATIC_ROUTE(t):
-    r'\B/[^<{\r\n\s]*'
-    return t
+def _mk_type(typ, arg):
+    key = (typ, arg)
+    return _LEAF_TYPES.setdefault(key, key)
 
 
-def t_STATUS_CODE_MATCHER(t):
-    r'[0-9]+[X]+'
-    return t
+class Parser(object):
+    """Recursive descent parser for the schema language, each ``_parse_*``
+    method implements the grammar rule in its docstring.
+    """
 
+    def __init__(self, data):
+        self.tokens = Tokenizer(data).tokenize()
+        self.pos = 0
 
-def t_LITERAL_INTEGER(t):
-    r'[+-]?[0-9]+'
-    t.value = int(t.value)
-    return t
+    def _peek(self):
+        return self.tokens[self.pos][0]
 
+    def _advance(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token[1]
 
-def t_LITERAL_STRING(t):
-    r'(\"([^\\\n]|(\\.))*?\")'
-    s = t.value[1:-1]
-    maps = {
-        't': '\t',
-        'r': '\r',
-        'n': '\n',
-        '\\': '\\',
-        '"': '\"'
-    }
-    i = 0
-    length = len(s)
-    val = ''
-    while i < length:
-        if s[i] == '\\':
-            i += 1
-            if s[i] in maps:
-                val += maps[s[i]]
-            else:
-                raise _InternalLexerError('unsupported escaping char %r at '
-                                          'line %d' % (s[i], t.lineno))
-        else:
-            val += s[i]
-        i += 1
-    t.value = val
-    return t
+    def _accept(self, kind):
+        if self.tokens[self.pos][0] == kind:
+            self.pos += 1
+            return True
+        return False
 
+    def _expect(self, kind):
+        if self.tokens[self.pos][0] != kind:
+            self._error()
+        return self._advance()
+
+    def _error(self):
+        kind, _, text, lineno = self.tokens[self.pos]
+        if kind == 'EOF':
+            raise _InternalGrammarError('grammar error at EOF')
+        raise _InternalGrammarError('grammar error %r at line %d' % (text,
+                                                                     lineno))
+
+    def parse(self):
+        """start : request response*"""
+        request = self._parse_request()
+        responses = []
+        while self._peek() in ('LITERAL_INTEGER', 'STATUS_CODE_MATCHER'):
+            responses.append(self._parse_response())
+        self._expect('EOF')
+        return dict(request=request, responses=responses)
+
+    def _parse_request(self):
+        """request : (METHOD '/'?)* route json_schema?"""
+        methods = []
+        while self._peek() == 'METHOD':
+            methods.append(self._advance())
+            self._accept('/')
+        route = self._parse_route()
+        return dict(methods=methods, route=route,
+                    schema=self._parse_optional_json_schema())
+
+    def _parse_route(self):
+        """route : (STATIC_ROUTE route_var?)*"""
+        path = ''
+        args = {}
+        while self._peek() == 'STATIC_ROUTE':
+            path += self._advance()
+            if self._peek() == '<':
+                name, typ = self._parse_route_var()
+                path += '<' + name + '>'
+                args[name] = typ
+        return [path, args]
+
+    def _parse_route_var(self):
+        """route_var : '<' type ':' IDENTIFIER '>' | '<' IDENTIFIER '>'"""
+        self._expect('<')
+        if self._peek() == 'IDENTIFIER':
+            name = self._advance()
+            self._expect('>')
+            return name, None
+        typ = self._parse_type()
+        self._expect(':')
+        name = self._expect('IDENTIFIER')
+        self._expect('>')
+        return name, typ
+
+    def _parse_response(self):
+        """response : status_code ('/' status_code)* json_schema?
+        status_code : LITERAL_INTEGER | STATUS_CODE_MATCHER
+        """
+        status_code = []
+        while self._peek() in ('LITERAL_INTEGER', 'STATUS_CODE_MATCHER'):
+            status_code.append(self._advance())
+            if not self._accept('/'):
+                break
+        return dict(status_code=status_code,
+                    schema=self._parse_optional_json_schema())
 
-###
-# Parser
-###
+    def _parse_optional_json_schema(self):
+        if self._peek() in ('{', '['):
+            return self._parse_json_schema()
+        return None
 
-def _parse_seq(p):
-    if len(p) == 4:
-        p[0] = [p[1]] + p[3]
-    elif len(p) == 3:
-        p[0] = [p[1]] + p[2]
-    elif len(p) == 2:
-        p[0] = [p[1]]
-    elif len(p) == 1:
-        p[0] = []
-
-
-def p_error(p):
-    if p is None:
-        raise _InternalGrammarError('grammar error at EOF')
-    raise _InternalGrammarError('grammar error %r at line %d' % (p.value,
-                                                                 p.lineno))
-
-
-def p_start(p):
-    '''start : request response_seq'''
-    p[0] = dict(request=p[1], responses=p[2])
-
-
-def p_request(p):
-    '''request : method_seq route json_schema
-               | method_seq route'''
-    if len(p) == 4:
-        p[0] = dict(methods=p[1], route=p[2], schema=p[3])
-    elif len(p) == 3:
-        p[0] = dict(methods=p[1], route=p[2], schema=None)
-
-
-def p_method_seq(p):
-    '''method_seq : method '/' method_seq
-                  | method method_seq
-                  |'''
-    _parse_seq(p)
-
-
-def p_method(p):
-    '''method : POST
-              | GET
-              | PUT
-              | DELETE
-              | PATCH
-              | HEAD
-              | OPTIONS'''
-    p[0] = p[1]
-
-
-def p_route(p):
-    '''route : route route_item
-             |'''
-    if len(p) == 3:
-        if p[2][1]:
-            dct = dict(list(p[1][1].items()) + [p[2][1]])
-            p[0] = [p[1][0] + p[2][0] + '<' + p[2][1][0] + '>', dct]
+    def _parse_json_schema(self):
+        """json_schema : object | array"""
+        if self._peek() == '{':
+            return self._parse_object()
+        elif self._peek() == '[':
+            return self._parse_array()
+        self._error()
+
+    def _parse_object(self):
+        """object : '{' (LITERAL_STRING ':' value ','?)* ELLIPSIS? '}'"""
+        self._expect('{')
+        dct = {}
+        while self._peek() == 'LITERAL_STRING':
+            key = intern(self._advance())  # Faster lookups on validation
+            self._expect(':')
+            dct[key] = self._parse_value()
+            self._accept(',')
+        if self._accept('ELLIPSIS'):
+            dct[S_ELLIPSIS] = None
+        self._expect('}')
+        return dct
+
+    def _parse_array(self):
+        """array : '[' (value ','?)* ELLIPSIS? ']'"""
+        self._expect('[')
+        lst = []
+        while self._peek() in ('TYPE', 'STRING', '{', '['):
+            lst.append(self._parse_value())
+            self._accept(',')
+        if self._accept('ELLIPSIS'):
+            lst.append(S_ELLIPSIS)
+        self._expect(']')
+        return lst
+
+    def _parse_value(self):
+        """value : (type | json_schema) '*'?"""
+        if self._peek() in ('{', '['):
+            typ = self._parse_json_schema()
         else:
-            p[0] = [p[1][0] + p[2][0], p[1][1]]
-    elif len(p) == 1:
-        p[0] = ['', {}]
-
-
-def p_route_item(p):
-    '''route_item : STATIC_ROUTE route_var
-                  | STATIC_ROUTE'''
-    if len(p) == 3:
-        p[0] = [p[1], p[2]]
-    elif len(p) == 2:
-        p[0] = [p[1], None]
-
-
-def p_route_var(p):
-    '''route_var : '<' type ':' IDENTIFIER '>'
-                 | '<' IDENTIFIER '>' '''
-    if len(p) == 6:
-        p[0] = (p[4], p[2])
-    elif len(p) == 4:
-        p[0] = (p[2], None)
-
-
-def p_response_seq(p):
-    '''response_seq : response_item response_seq
-                    |'''
-    if len(p) == 3:
-        p[0] = [p[1]] + p[2]
-    elif len(p) == 1:
-        p[0] = []
-
-
-def p_response_item(p):
-    '''response_item : status_code_seq json_schema
-                     | status_code_seq'''
-    if len(p) == 3:
-        p[0] = dict(status_code=p[1], schema=p[2])
-    elif len(p) == 2:
-        p[0] = dict(status_code=p[1], schema=None)
-
-
-def p_status_code_seq(p):
-    '''status_code_seq : status_code_item '/' status_code_seq
-                       | status_code_item
-                       |'''
-    _parse_seq(p)
-
-
-def p_status_code_item(p):
-    '''status_code_item : LITERAL_INTEGER
-                        | STATUS_CODE_MATCHER'''
-    p[0] = p[1]
-
-
-def p_json_schema(p):
-    '''json_schema : object
-                   | array '''
-    p[0] = p[1]
-
-
-def p_object(p):
-    '''object : '{' kv_seq '}'
-              | '{' kv_seq ELLIPSIS '}' '''
-    dct = dict(p[2])
-    if len(p) == 5:
-        dct[S_ELLIPSIS] = None
-    p[0] = dct
-
-
-def p_kv_seq(p):
-    '''kv_seq : kv ',' kv_seq
-              | kv kv_seq
-              |'''
-    _parse_seq(p)
-
-
-def p_kv(p):
-    '''kv : LITERAL_STRING ':' value'''
-    p[0] = (p[1], p[3])
-
-
-def p_array(p):
-    '''array : '[' value_seq ']'
-             | '[' value_seq ELLIPSIS ']' '''
-    if len(p) == 4:
-        p[0] = p[2]
-    elif len(p) == 5:
-        p[0] = p[2] + [p[3]]
-
-
-def p_value_seq(p):
-    '''value_seq : value ',' value_seq
-                 | value value_seq
-                 |'''
-    _parse_seq(p)
-
-
-def p_value(p):
-    '''value : type
-             | json_schema
-             | type '*'
-             | json_schema '*' '''
-    if len(p) == 3:
-        p[0] = (p[1], True)
-    elif len(p) == 2:
-        p[0] = (p[1], False)
-
-
-def p_type(p):
-    '''type : BOOL
-            | U8
-            | U16
-            | U32
-            | U64
-            | I8
-            | I16
-            | I32
-            | I64
-            | FLOAT
-            | string_type'''
-    p[0] = p[1]
-
-
-def p_string_type(p):
-    '''string_type : STRING
-                   | STRING '(' LITERAL_INTEGER ')' '''
-    if len(p) == 2:
-        p[0] = (T_STRING, None)
-    elif len(p) == 5:
-        p[0] = (T_STRING, p[3])
+            typ = self._parse_type()
+        return (typ, self._accept('*'))
+
+    def _parse_type(self):
+        """type : TYPE | STRING | STRING '(' LITERAL_INTEGER ')'"""
+        kind = self._peek()
+        if kind == 'TYPE':
+            return self._advance()
+        elif kind == 'STRING':
+            self._advance()
+            if self._accept('('):
+                length = self._expect('LITERAL_INTEGER')
+                self._expect(')')
+                return _mk_type(T_STRING, length)
+            return _mk_type(T_STRING, None)
+        self._error()
 
 
 def parse_schema(data):
     """Parse schema string to schema dict.
     """
-    # Rebuild `lexer` and `parser` each time.
-    lexer = lex.lex()
-    parser = yacc.yacc(debug=False, write_tables=0)
+    return Parser(data).parse()
+
 
-    lexer.lineno = 1
-    return parser.parse(data)
+_SCHEMA_BLOCK_RE = re.compile(r'''
+    Schema::?[^\n]*(?:\n|$)           # line with the schema sign
+    (?:[ \t\r]*\n)*                    # blank lines
+    (?P<block>
+        (?P<indent>[ \t]*)[^\n]*       # first line sets the block indent
+        (?:\n(?:[ \t\r]*(?=\n|$)        # blank lines
+             |(?P=indent)[^\n]*))*     # lines indented at least as much
+    )
+''', re.VERBOSE)
+
+
+_PARSED = {}  # docstring => schema
 
 
 def parse(data):
@@ -587,45 +504,52 @@ def parse(data):
     Returns ``None`` if:
         1. ``data`` is ``None`` or falsely.
         2. No schema sign found in ``data``.
+    Results are memoized by docstring text, the returned schema is shared
+    and should not be modified.
     """
     if not data:
         return None
-    block_start = False
-    lines = []
-    ident = None
-    for line in data.splitlines():
-        if not block_start:
-            if 'Schema::' in line or \
-                    'Schema:' in line:
-                block_start = True
-            continue
-        if not line or line.isspace():
-            continue  # skip space or empty lines
-        _ident = len(line) - len(line.lstrip())
-        if ident is None:
-            ident = _ident
-            lines.append(line)
-        else:
-            if ident <= _ident:
-                lines.append(line)
-            else:
-                break
-    if block_start:
-        return parse_schema('\n'.join(lines))
-    return None
+    idx = data.find('Schema:')
+    if idx < 0:
+        return None
+    schema = _PARSED.get(data)
+    if schema is None:
+        m = _SCHEMA_BLOCK_RE.search(data, idx)
+        if m is None:
+            return None
+        schema = _PARSED[data] = parse_schema(m.group('block'))
+    return schema
+
+
+_SCHEMA_CACHE = {}  # id(func) => (weakref(func), schema)
+_NO_SCHEMA = object()
+_MISSING = object()
 
 
 def parse_from_func(func):
     """Parse schema from function by parsing its ``__doc__``.
     Returns ``None`` if given func has no ``__doc__``.
+    Results are cached per function until the function is garbage collected.
     """
-    data = getattr(func, '__doc__', None)
-    if data is None:
-        return None
+    key = id(func)
+    cached = _SCHEMA_CACHE.get(key)
+    if cached is not None and cached[0]() is func:
+        schema = cached[1]
+        return None if schema is _NO_SCHEMA else schema
+    schema = _parse_from_func(func)
+    try:
+        ref = weakref.ref(func, lambda _: _SCHEMA_CACHE.pop(key, None))
+    except TypeError:  # Not weakly referenceable, skip caching
+        return schema
+    _SCHEMA_CACHE[key] = (ref, _NO_SCHEMA if schema is None else schema)
+    return schema
+
+
+def _parse_from_func(func):
     try:
-        return parse(data)
+        return parse(getattr(func, '__doc__', None))
     except _InternalError as exc:
-        func_code = get_func_code(func)
+        func_code = func.__code__  # Also available on Python 2.6+
         msg = '{}:{}:{}: {}'.format(func_code.co_filename,
                                     func_code.co_firstlineno,
                                     func_code.co_name,
@@ -653,66 +577,66 @@ def raise_validation_error(errtyp, value, p, key=None):
         cls = ResponseValidationError
     else:
         cls = ValidationError
-    code, reason = errtyp
-    raise cls(code=code, reason=reason, value=value, key=key)
+    raise cls(errtyp[0], errtyp[1], value, key)
 
 
 def validate_bool(val, p, key=None):
-    if isinstance(val, bool):
+    if type(val) is bool:
         return
     raise_validation_error(ErrInvalidBool, val, p, key=key)
 
 
 def validate_u8(val, p, key=None):
-    if isinstance(val, int) and ctypes.c_uint8(val).value == val:
+    if type(val) is int and 0 <= val <= _U8_HI:
         return
     raise_validation_error(ErrInvalidU8, val, p, key=key)
 
 
 def validate_u16(val, p, key=None):
-    if isinstance(val, int) and ctypes.c_uint16(val).value == val:
+    if type(val) is int and 0 <= val <= _U16_HI:
         return
     raise_validation_error(ErrInvalidU16, val, p, key=key)
 
 
 def validate_u32(val, p, key=None):
-    if isinstance(val, int) and ctypes.c_uint32(val).value == val:
+    if type(val) is int and 0 <= val <= _U32_HI:
         return
     raise_validation_error(ErrInvalidU32, val, p, key=key)
 
 
 def validate_u64(val, p, key=None):
-    if isinstance(val, (int, long)) and ctypes.c_uint64(val).value == val:
+    if type(val) in integer_types and 0 <= val <= _U64_HI:
         return
     raise_validation_error(ErrInvalidU64, val, p, key=key)
 
 
 def validate_i8(val, p, key=None):
-    if isinstance(val, int) and ctypes.c_int8(val).value == val:
+    if type(val) is int and _I8_LO <= val <= _I8_HI:
         return
     raise_validation_error(ErrInvalidI8, val, p, key=key)
 
 
 def validate_i16(val, p, key=None):
-    if isinstance(val, int) and ctypes.c_int16(val).value == val:
+    if type(val) is int and _I16_LO <= val <= _I16_HI:
         return
     raise_validation_error(ErrInvalidI16, val, p, key=key)
 
 
 def validate_i32(val, p, key=None):
-    if isinstance(val, int) and ctypes.c_int32(val).value == val:
+    if type(val) is int and _I32_LO <= val <= _I32_HI:
         return
     raise_validation_error(ErrInvalidI32, val, p, key=key)
 
 
 def validate_i64(val, p, key=None):
-    if isinstance(val, (int, long)) and ctypes.c_int64(val).value == val:
+    if type(val) in integer_types and _I64_LO <= val <= _I64_HI:
         return
     raise_validation_error(ErrInvalidI64, val, p, key=key)
 
 
 def validate_float(val, p, key=None):
-    if isinstance(val, (int, long, float)):
+    typ = type(val)
+    if typ is float or typ in integer_types:
         return
     raise_validation_error(ErrInvalidFloat, val, p, key=key)
 
@@ -724,190 +648,506 @@ def validate_string(val, typ, p, key=None):
     raise_validation_error(ErrInvalidString, val, p, key=key)
 
 
+_VALIDATORS = {
+    T_BOOL: validate_bool,
+    T_U8: validate_u8,
+    T_U16: validate_u16,
+    T_U32: validate_u32,
+    T_U64: validate_u64,
+    T_I8: validate_i8,
+    T_I16: validate_i16,
+    T_I32: validate_i32,
+    T_I64: validate_i64,
+    T_FLOAT: validate_float,
+}
+
+
 def validate_type(val, typ, p, key=None):
-    if typ == T_BOOL:
-        return validate_bool(val, p, key=key)
-    elif typ == T_U8:
-        return validate_u8(val, p, key=key)
-    elif typ == T_U16:
-        return validate_u16(val, p, key=key)
-    elif typ == T_U32:
-        return validate_u32(val, p, key=key)
-    elif typ == T_U64:
-        return validate_u64(val, p, key=key)
-    elif typ == T_I8:
-        return validate_i8(val, p, key=key)
-    elif typ == T_I16:
-        return validate_i16(val, p, key=key)
-    elif typ == T_I32:
-        return validate_i32(val, p, key=key)
-    elif typ == T_I64:
-        return validate_i64(val, p, key=key)
-    elif typ == T_FLOAT:
-        return validate_float(val, p, key=key)
-    elif isinstance(typ, tuple) and typ[0] == T_STRING:
+    if type(typ) is tuple:  # (T_STRING, maxlength)
         return validate_string(val, typ, p, key=key)
+    fn = _VALIDATORS.get(typ)
+    if fn is not None:
+        return fn(val, p, key=key)
 
 
-def validate_array(val, typ, p, key=None):
-    if not isinstance(val, list):
-        raise_validation_error(ErrNotArray, val, p, key=key)
+def _validate_any(val, p):
+    pass
+
+
+def _prefix_error_key(exc, prefix):
+    exc.key = prefix + (exc.key or '')
+
+
+_COMPILED = {}  # schema key => validator function
+
+
+def _schema_key(typ):
+    """Returns a hashable key for type ``typ``, structurally equal types
+    share the same key.
+    """
+    if isinstance(typ, dict):
+        return ('{',) + tuple((ikey, _value_key(ityp))
+                              for ikey, ityp in typ.items())
+    elif isinstance(typ, list):
+        return ('[',) + tuple(_value_key(ityp) for ityp in typ)
+    return typ
+
+
+def _value_key(typ):
+    if isinstance(typ, tuple):  # (type, nullable)
+        return _schema_key(typ[0]), typ[1]
+    return typ  # S_ELLIPSIS or None
+
+
+def compile_type(typ):
+    """Compile type ``typ`` to a validator function ``fn(val, p)``, which
+    raises ``ValidationError`` on invalid non-null ``val``. Validators are
+    shared between structurally equal types.
+    """
+    key = _schema_key(typ)
+    fn = _COMPILED.get(key)
+    if fn is None:
+        fn = _COMPILED[key] = _compile_type(typ)
+    return fn
+
+
+def _compile_type(typ):
+    if isinstance(typ, dict):
+        return compile_object(typ)
+    elif isinstance(typ, list):
+        return compile_array(typ)
+    elif isinstance(typ, tuple):  # (T_STRING, maxlength)
+        return compile_string(typ)
+    return _VALIDATORS.get(typ, _validate_any)
+
+
+def _validate_string_any(val, p):
+    if not isinstance(val, basestring):
+        raise_validation_error(ErrInvalidString, val, p)
+
+
+def compile_string(typ):
+    """Compile string type ``typ`` to a validator function ``fn(val, p)``.
+    """
+    maxlength = typ[1]
+    if maxlength is None:
+        return _validate_string_any
+
+    def check(val, p):
+        if not isinstance(val, basestring) or len(val) > maxlength:
+            raise_validation_error(ErrInvalidString, val, p)
+    return check
+
+
+def compile_array(typ):
+    """Compile array type ``typ`` to a validator function ``fn(val, p)``.
+    """
     if not typ:
-        if val:  # Must be empty array
-            raise_validation_error(ErrShouldBeEmptyArray, val, p, key=key)
-        return
+        def check_empty(val, p):
+            if type(val) is not list:
+                raise_validation_error(ErrNotArray, val, p)
+            if val:  # Must be empty array
+                raise_validation_error(ErrShouldBeEmptyArray, val, p)
+        return check_empty
+
     if typ[0] == S_ELLIPSIS:
-        return
-    for i in range(len(typ)):
-        ityp = typ[i]
-        if i < len(typ)-1 and typ[i+1] == S_ELLIPSIS:
-            while i < len(val):
-                ival = val[i]
+        def check_any(val, p):
+            if type(val) is not list:
+                raise_validation_error(ErrNotArray, val, p)
+        return check_any
+
+    ellipsis = typ[-1] == S_ELLIPSIS
+    items = [(compile_type(ityp), nullable)
+             for ityp, nullable in (typ[:-1] if ellipsis else typ)]
+    if not ellipsis:
+        return _compile_fixed_array(tuple(items))
+    # Bounds for non-nullable integer tails, checked in bulk at C level
+    bounds = None
+    if not items[-1][1] and isinstance(typ[-2][0], int):
+        bounds = _INT_BOUNDS.get(typ[-2][0])
+    return _compile_repeat_array(tuple(items[:-1]), items[-1], bounds)
+
+
+def _compile_fixed_array(items):
+    size = len(items)
+
+    def check_fixed(val, p):
+        if type(val) is not list:
+            raise_validation_error(ErrNotArray, val, p)
+        if len(val) != size:
+            if len(val) < size:
+                raise_validation_error(ErrArrayElementsNotEnough, val, p)
+            raise_validation_error(ErrArrayLength, val, p)
+        i = 0
+        try:
+            for ival, (fn, nullable) in zip(val, items):
+                if ival is None:
+                    if not nullable:
+                        raise_validation_error(ErrNullable, ival, p)
+                else:
+                    fn(ival, p)
                 i += 1
-                validate_value(ival, ityp, p, key='{0}[{1}]'.format(key, i))
-            return None
-        else:
-            if i >= len(val):
-                raise_validation_error(ErrArrayElementsNotEnough, val, p,
-                                       key=key)
-            ival = val[i]
-            validate_value(ival, ityp, p, key='{0}[{1}]'.format(key, i))
-    if len(typ) != len(val):  # No ELLIPSIS
-        raise_validation_error(ErrArrayLength, val, p, key=key)
+        except ValidationError as exc:
+            _prefix_error_key(exc, '[{0}]'.format(i))
+            raise
+    return check_fixed
+
+
+def _compile_repeat_array(head, tail, bounds):
+    size = len(head)  # Required elements
+    fn_tail, nullable_tail = tail
+
+    def check_repeat(val, p):
+        if type(val) is not list:
+            raise_validation_error(ErrNotArray, val, p)
+        if len(val) < size:
+            raise_validation_error(ErrArrayElementsNotEnough, val, p)
+        i = 0
+        try:
+            for ival, (fn, nullable) in zip(val, head):
+                if ival is None:
+                    if not nullable:
+                        raise_validation_error(ErrNullable, ival, p)
+                else:
+                    fn(ival, p)
+                i += 1
+            rest = val[size:] if size else val
+            if bounds is not None and rest and \
+                    bounds[2].issuperset(map(type, rest)) and \
+                    bounds[0] <= min(rest) and max(rest) <= bounds[1]:
+                return
+            for ival in rest:
+                if ival is None:
+                    if not nullable_tail:
+                        raise_validation_error(ErrNullable, ival, p)
+                else:
+                    fn_tail(ival, p)
+                i += 1
+        except ValidationError as exc:
+            _prefix_error_key(exc, '[{0}]'.format(i))
+            raise
+    return check_repeat
 
 
-def validate_object(val, typ, p, key=None):
-    if not isinstance(val, dict):
-        raise_validation_error(ErrNotObject, val, p, key=key)
-    for ikey, ityp in typ.items():
-        if ikey == S_ELLIPSIS:
-            continue
-        if ikey not in val:
-            _, nullable = ityp
-            if nullable:
+def compile_object(typ):
+    """Compile object type ``typ`` to a validator function ``fn(val, p)``.
+    """
+    fields = dict((ikey, (compile_type(ityp[0]), ityp[1]))
+                  for ikey, ityp in typ.items() if ikey != S_ELLIPSIS)
+    required = tuple(ikey for ikey, field in fields.items() if not field[1])
+    num_required = len(required)
+    strict = S_ELLIPSIS not in typ
+
+    def check(val, p):
+        if type(val) is not dict:
+            raise_validation_error(ErrNotObject, val, p)
+        seen = 0
+        for ikey, ival in val.items():
+            field = fields.get(ikey)
+            if field is None:
+                if strict:
+                    errtyp = ErrObjectUnexpectedKey[0], \
+                        "unexpected key {} in object".format(ikey)
+                    raise_validation_error(errtyp, val, p,
+                                           key='.{0}'.format(ikey))
                 continue
-            errtyp = ErrObjectKeyNotFound[0], \
-                "key {} not found in object".format(ikey)
-            raise_validation_error(errtyp, val, p,
-                                   key='{0}.{1}'.format(key, ikey))
-        ival = val[ikey]
-        validate_value(ival, ityp, p, key='{0}.{1}'.format(key, ikey))
-    if S_ELLIPSIS not in typ:
-        for ikey in val:
-            if ikey not in typ:
-                errtyp = ErrObjectUnexpectedKey[0], \
-                    "unexpected key {} in object".format(ikey)
-                raise_validation_error(errtyp, val, p,
-                                       key='{0}.{1}'.format(key, ikey))
+            if not field[1]:
+                seen += 1
+            if ival is None:
+                if field[1]:
+                    continue
+                raise_validation_error(ErrNullable, ival, p,
+                                       key='.{0}'.format(ikey))
+            try:
+                field[0](ival, p)
+            except ValidationError as exc:
+                _prefix_error_key(exc, '.{0}'.format(ikey))
+                raise
+        if seen != num_required:
+            for ikey in required:
+                if ikey not in val:
+                    errtyp = ErrObjectKeyNotFound[0], \
+                        "key {} not found in object".format(ikey)
+                    raise_validation_error(errtyp, val, p,
+                                           key='.{0}'.format(ikey))
+    return check
+
+
+def compile_json(typ):
+    """Compile request or response json schema ``typ`` to a validator
+    function ``fn(val, p)``.
+    """
+    if typ is None:
+        def check_null(val, p):
+            if val is not None:
+                raise_validation_error(ErrShouldBeNull, val, p)
+        return check_null
+
+    if not isinstance(typ, (list, dict)):
+        def check_invalid(val, p):
+            raise_validation_error(ErrInvalidJSON, val, p)
+        return check_invalid
+
+    fn = compile_type(typ)
+
+    def check(val, p):
+        if val is None:  # top json mustn't be null
+            raise_validation_error(ErrNullable, val, p)
+        fn(val, p)
+    return check
+
+
+def _validate_with(fn, val, p, key):
+    try:
+        fn(val, p)
+    except ValidationError as exc:
+        if key:
+            _prefix_error_key(exc, key)
+        raise
+
+
+def validate_array(val, typ, p, key=None):
+    _validate_with(compile_type(typ), val, p, key)
+
+
+def validate_object(val, typ, p, key=None):
+    _validate_with(compile_type(typ), val, p, key)
 
 
 def validate_value(val, typ, p, key=None):  # Main entry
-    ityp, nullable = typ
     if val is None:
-        if not nullable:
+        if not typ[1]:
             raise_validation_error(ErrNullable, val, p, key=key)
         return
-    if isinstance(ityp, dict):
-        validate_object(val, ityp, p, key=key)
-    elif isinstance(ityp, list):
-        validate_array(val, ityp, p, key=key)
-    else:
-        validate_type(val, ityp, p, key=key)
+    _validate_with(compile_type(typ[0]), val, p, key)
 
 
 def validate_json(val, typ, p, key=None):
-    if typ is None:
-        if val is not None:
-            raise_validation_error(ErrShouldBeNull, val, p, key=key)
-        return
-    if isinstance(typ, (list, dict)):
-        ityp = (typ, False)  # top json mustn't be null
-        return validate_value(val, ityp, p, key=key)
-    raise_validation_error(ErrInvalidJSON, val, p, key=key)
+    _validate_with(compile_json(typ), val, p, key)
+
+
+def compile_methods(typ):
+    """Compile method tags ``typ`` to a bitmask for ``validate_method``.
+    """
+    mask = 0
+    for tag in typ:
+        mask |= 1 << tag
+    return mask
 
 
 def validate_method(val, typ, p):
-    if val == 'POST' and M_POST in typ:
-        return
-    elif val == 'GET' and M_GET in typ:
-        return
-    elif val == 'PUT' and M_PUT in typ:
-        return
-    elif val == 'DELETE' and M_DELETE in typ:
-        return
-    elif val == 'PATCH' and M_PATCH in typ:
-        return
-    elif val == 'HEAD' and M_HEAD in typ:
-        return
-    elif val == 'OPTIONS' and M_OPTIONS in typ:
+    """Validate method name ``val`` against method tags or a bitmask
+    compiled by ``compile_methods``.
+    """
+    if isinstance(typ, integer_types):
+        if not typ & _METHOD_BITS.get(val, 0):
+            raise_validation_error(ErrInvalidMethod, val, p)
         return
-    raise_validation_error(ErrInvalidMethod, val, p)
+    tag = _METHOD_TAGS.get(val)
+    if tag is None or tag not in typ:
+        raise_validation_error(ErrInvalidMethod, val, p)
+
+
+def compile_route(typ):
+    """Compile route schema ``typ`` to a validator function ``fn(val, p)``,
+    where ``val`` is the dict of route variables.
+    """
+    checks = [(key, compile_type(ityp)) for key, ityp in typ[1].items()]
+
+    def check(val, p):
+        for key, fn in checks:
+            ival = val.get(key, _MISSING)
+            if ival is _MISSING:
+                errtyp = ErrRouteVarNotFound[0], \
+                    'route variable {} not found in route args'.format(key)
+                raise_validation_error(errtyp, val, p)
+            fn(ival, p)
+    return check
 
 
 def validate_route(val, typ, p):
-    args_typ = typ[1]
-    for key, ityp in args_typ.items():
-        if key not in val:
-            errtyp = ErrRouteVarNotFound[0], \
-                'route variable {} not found in route args'.format(key)
-            raise_validation_error(errtyp, val, p)
-        ival = val[key]
-        validate_type(ival, ityp, p)
+    compile_route(typ)(val, p)
+
+
+def compile_request(typ):
+    """Compile request schema ``typ`` to a validator function ``fn()`` that
+    validates current flask request.
+    """
+    methods = compile_methods(typ['methods'])
+    route_validator = compile_route(typ['route'])
+    json_validator = compile_json(typ['schema'])
+
+    def check():
+        req = request._get_current_object()
+        validate_method(req.method, methods, P_REQUEST)
+        route_validator(req.view_args, P_REQUEST)
+        if req.is_json and req.get_data(cache=True):
+            val = req.get_json(cache=True)  # Malformed json aborts with 400
+        else:
+            val = req.get_json(silent=True, cache=True)  # E.g. GET, no 415
+        json_validator(val, P_REQUEST)
+    return check
 
 
 def validate_request(typ):
-    validate_method(request.method, typ['methods'], P_REQUEST)
-    validate_route(request.view_args, typ['route'], P_REQUEST)
-    validate_json(request.get_json(), typ['schema'], P_REQUEST, key='')
+    compile_request(typ)()
+
+
+def compile_status_code(matcher):
+    """Compile status code matcher like ``4XX`` to an inclusive range
+    ``(lo, hi)``, integer status codes are returned as they are.
+    """
+    if isinstance(matcher, basestring):
+        digits = matcher.rstrip('X')
+        scale = 10 ** (len(matcher) - len(digits))
+        lo = int(digits) * scale
+        return lo, lo + scale - 1
+    return matcher
+
+
+def _status_code_int(code):
+    """Convert response status ``code`` like ``'201'`` or ``'201 CREATED'``
+    to integer, returns ``None`` if it is not a valid status code.
+    """
+    if isinstance(code, integer_types):
+        return code
+    if isinstance(code, basestring):
+        try:
+            return int(code.split()[0])
+        except (ValueError, IndexError):
+            pass
+    return None  # E.g. headers dict in ``(body, headers)``
 
 
 def match_status_code(matcher, code):
-    code_s = str(code)
-    matcher_s = str(matcher)
-    if len(code_s) != len(matcher_s):
+    code = _status_code_int(code)
+    if code is None:
         return False
-    for i, ch in enumerate(code_s):
-        if matcher_s[i] == ch or matcher_s[i] == 'X':
-            continue
+    if isinstance(matcher, basestring):
+        matcher = compile_status_code(matcher)
+    if isinstance(matcher, tuple):
+        return matcher[0] <= code <= matcher[1]
+    return matcher == code
+
+
+_JSON_SCALAR_TYPES = frozenset((bool, float, str, unicode) + integer_types)
+
+
+def _is_json_native(val):
+    """Returns ``True`` if ``val`` is built of JSON native types only, which
+    serialize to the same structure that the client receives.
+    """
+    if type(val) is dict:
+        for k, v in val.items():
+            if type(k) not in (str, unicode) or not _is_json_native(v):
+                return False
+        return True
+    if type(val) is list:
+        for v in val:
+            if not _is_json_native(v):
+                return False
+        return True
+    return val is None or type(val) in _JSON_SCALAR_TYPES
+
+
+def compile_responses(typ):
+    """Compile responses schema ``typ`` to a validator function
+    ``fn(response)``.
+    """
+    matchers = []  # [(matcher, json_validator), ..] in declaration order
+    for response_typ in typ:
+        json_typ = response_typ['schema']
+        json_validator = compile_json(json_typ) if json_typ is not None \
+            else None
+        for matcher in response_typ['status_code']:
+            matchers.append((compile_status_code(matcher), json_validator))
+    # The first declared match wins, so each exact code gets every validator
+    # covering it, wildcards included, in declaration order.
+    exact = {}  # {status_code: [json_validator, ..]}
+    for matcher, _ in matchers:
+        if not isinstance(matcher, tuple) and matcher not in exact:
+            exact[matcher] = [json_validator
+                              for m, json_validator in matchers
+                              if match_status_code(m, matcher)]
+    wild = [matcher + (json_validator,)  # [(lo, hi, json_validator), ..]
+            for matcher, json_validator in matchers
+            if isinstance(matcher, tuple)]
+    no_content = all(response_typ['schema'] is None for response_typ in typ)
+
+    def check(val):
+        p = P_RESPONSE
+        if isinstance(val, basestring):
+            status_code = 200
+            data = val
+        elif isinstance(val, Response):
+            status_code = val.status_code
+            if no_content and val.calculate_content_length() == 0:
+                data = None  # Known empty, skip materializing the body
+            else:
+                data = val.get_data()
+        elif isinstance(val, dict):
+            status_code = 200
+            data = val
+        elif isinstance(val, (tuple, list)):
+            data = val[0]
+            status_code = _status_code_int(val[1])
+            if status_code is None:
+                raise_validation_error(ErrInvalidResponse, val, p)
+        else:
+            raise_validation_error(ErrInvalidResponse, val, p)
+        if isinstance(data, (dict, list)):
+            if _is_json_native(data):
+                response_json = data  # Not serialized yet, skip round trip
+            else:  # Validate what flask's encoder actually sends
+                try:
+                    data = flask_json.dumps(data)
+                except (TypeError, ValueError):
+                    raise_validation_error(ErrInvalidResponse, val, p)
+                response_json = _loads_json(data, val, p)
+        elif data:
+            response_json = _loads_json(data, val, p)
         else:
-            return False
+            response_json = None
+        json_validators = exact.get(status_code)
+        if json_validators is not None:
+            for json_validator in json_validators:
+                if _check_response_json(json_validator, response_json, p):
+                    return
+        else:
+            for lo, hi, json_validator in wild:
+                if lo <= status_code <= hi and \
+                        _check_response_json(json_validator, response_json,
+                                             p):
+                    return
+        raise_validation_error(ErrInvalidResponse, val, p)
+    return check
+
+
+def _loads_json(data, val, p):
+    """Decode response json ``data``, the standard library and orjson raise
+    different errors on bad input, both are reported as
+    ``ErrInvalidResponse``.
+    """
+    try:
+        return json_loads(data)
+    except (TypeError, ValueError):
+        raise_validation_error(ErrInvalidResponse, val, p)
+
+
+def _check_response_json(json_validator, val, p):
+    """Returns ``True`` if response json ``val`` is accepted by
+    ``json_validator``, ``None`` validator means no content.
+    """
+    if json_validator is None:
+        return val is None or val == ''  # Enable empty string''
+    if val is None:
+        return False
+    json_validator(val, p)
     return True
 
 
 def validate_response(val, typ):
-    p = P_RESPONSE
-    if isinstance(val, basestring):
-        status_code = 200
-        data = val
-    elif isinstance(val, Response):
-        status_code = val.status_code
-        data = val.get_data()
-    elif isinstance(val, (tuple, list)):
-        data = val[0]
-        status_code = val[1]
-    else:
-        raise_validation_error(ErrInvalidResponse, val, p)
-    if data:
-        try:
-            response_json = json.loads(str(data, 'utf8'))
-        except ValueError:
-            raise_validation_error(ErrInvalidResponse, val, p)
-    else:
-        response_json = None
-    for response_typ in typ:
-        code_matchers = response_typ['status_code']
-        json_typ = response_typ['schema']
-        for code_matcher in code_matchers:
-            if match_status_code(code_matcher, status_code):
-                if json_typ is None:
-                    if response_json is None:
-                        return
-                    if response_json == '':
-                        return  # Enable empty string''  # noqa
-                elif json_typ is not None and response_json is not None:
-                    return validate_json(response_json, json_typ, p,
-                                         key='')
-    raise_validation_error(ErrInvalidResponse, val, p)
+    compile_responses(typ)(val)
 
 
 def validate(func):
@@ -929,16 +1169,22 @@ def validate(func):
             '''
             pass
     """
+    if getattr(func, '_docjson_compiled', None) is not None:
+        return func  # Already validated, e.g. decorated before register_all
     schema = parse_from_func(func)
     if schema is None:
         return func
 
+    request_validator = compile_request(schema['request'])
+    response_validator = compile_responses(schema['responses'])
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        validate_request(schema['request'])
+        request_validator()
         response = func(*args, **kwargs)
-        validate_response(response, schema['responses'])
+        response_validator(response)
         return response
+    wrapper._docjson_compiled = (request_validator, response_validator)
     return wrapper
 
 
@@ -43,7 +43,8 @@ setup(
     include_package_data=True,
     zip_safe=False,
     platforms='any',
-    install_requires=['Flask', 'ply'],
+    install_requires=['Flask'],
+    extras_require={'orjson': ['orjson']},
     classifiers=[
         'Environment :: Web Environment',
         'Intended Audience :: Developers',
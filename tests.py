@@ -1,12 +1,186 @@
 # -*- coding: utf-8 -*-
 
+import inspect
+import json
+import os
+import pickle
 import unittest
+from timeit import default_timer
 import flask_docjson as m
-from flask import Response
+from flask_docjson import (M_DELETE, M_GET, M_OPTIONS, M_POST, M_PUT,
+                           S_ELLIPSIS, T_FLOAT, T_I8, T_I16, T_I32, T_STRING,
+                           T_U8, T_U32)
+from flask import Flask, Response, jsonify
+
+
+ERR_BOOL = m.ErrInvalidBool[0]
+ERR_U8 = m.ErrInvalidU8[0]
+ERR_U16 = m.ErrInvalidU16[0]
+ERR_U32 = m.ErrInvalidU32[0]
+ERR_U64 = m.ErrInvalidU64[0]
+ERR_I8 = m.ErrInvalidI8[0]
+ERR_I32 = m.ErrInvalidI32[0]
+ERR_I64 = m.ErrInvalidI64[0]
+ERR_FLOAT = m.ErrInvalidFloat[0]
+ERR_STRING = m.ErrInvalidString[0]
+ERR_NULLABLE = m.ErrNullable[0]
+ERR_SHOULD_BE_NULL = m.ErrShouldBeNull[0]
+ERR_KEY_NOT_FOUND = m.ErrObjectKeyNotFound[0]
+ERR_UNEXPECTED_KEY = m.ErrObjectUnexpectedKey[0]
+ERR_ROUTE_VAR_NOT_FOUND = m.ErrRouteVarNotFound[0]
+ERR_METHOD = m.ErrInvalidMethod[0]
+ERR_RESPONSE = m.ErrInvalidResponse[0]
+ERR_NOT_ENOUGH = m.ErrArrayElementsNotEnough[0]
+ERR_ARRAY_LENGTH = m.ErrArrayLength[0]
+ERR_JSON = m.ErrInvalidJSON[0]
+
+UNSIGNED_ERRS = frozenset([ERR_U8, ERR_U16, ERR_U32, ERR_U64])
+
+
+EXPECTED_SIMPLE = {
+    'request': {
+        'route': ['/item', {}],
+        'methods': [M_POST, M_PUT],
+        'schema': {
+            'name': ((T_STRING, None), False),
+            'number': (T_I16, False),
+            'children': ([({'id': (T_I32, False)}, False),
+                          S_ELLIPSIS], False)
+        },
+    },
+    'responses': [
+        {'status_code': [200],
+         'schema': {
+             'id': (T_I32, False),
+             'name': ((T_STRING, None), False),
+             'number': (T_I16, False),
+             'children': ([({'id': (T_I32, False)}, False),
+                           S_ELLIPSIS], False)
+         }},
+        {'status_code': ['4XX', '5XX'],
+         'schema': {'message': ((T_STRING, None), False)}}
+    ]
+}
+
+EXPECTED_NO_CONTENT = {
+    'request': {
+        'route': ['/user/<id>', {'id': T_I32}],
+        'methods': [M_GET],
+        'schema': None,
+    },
+    'responses': [{'status_code': [201], 'schema': None}]
+}
+
+EXPECTED_ALTERNATIVE_SCHEMA_SIGN = {
+    'request': {
+        'route': ['/user/<id>', {'id': T_I32}],
+        'methods': [M_GET],
+        'schema': None,
+    },
+    'responses': [
+        {'status_code': [200],
+         'schema': {'id': (T_I32, False),
+                    'name': ((T_STRING, 33), False)}}
+    ],
+}
+
+EXPECTED_SCHEMA_ARRAY = {
+    'request': {
+        'route': ['/users', {}],
+        'methods': [M_GET],
+        'schema': None,
+    },
+    'responses': [
+        {'status_code': [200],
+         'schema': [({'id': (T_I32, False),
+                     'name': ((T_STRING, 32), False)}, False),
+                    S_ELLIPSIS]}
+    ]
+}
+
+EXPECTED_NULLABLE_SCHEMA = {
+    'request': {
+        'methods': [M_GET],
+        'route': ['/users', {}],
+        'schema': {
+            'name': ((T_STRING, 33), True)
+        }
+    },
+    'responses': [
+        {
+            'status_code': [201],
+            'schema': None
+        }
+    ]
+}
+
+EXPECTED_EMPTY_RESPONSE = {
+    'request': {
+        'methods': [M_DELETE],
+        'route': ['/user/<id>', {'id': T_I32}],
+        'schema': None,
+    },
+    'responses': [
+        {'schema': None, 'status_code': [201]},
+        {'schema': {'error': ((T_STRING, None), False)},
+         'status_code': ['4XX', '5XX']},
+    ]
+}
+
+# (validator, valid values, invalid values, error)
+SCALAR_CASES = [
+    (m.validate_bool, [True, False], [1, 'true'], ERR_BOOL),
+    (m.validate_u8, [0, 199], [1999, -1, True], ERR_U8),
+    (m.validate_u16, [65535], [65535 * 2], ERR_U16),
+    (m.validate_u32, [4294967295], [4294967296], ERR_U32),
+    (m.validate_u64, [0xffffffffffffffff], [0xffffffffffffffff + 1],
+     ERR_U64),
+    (m.validate_i8, [-128, 127], [-129, 128], ERR_I8),
+    (m.validate_i64, [-1], [False], ERR_I64),
+    (m.validate_float, [0.1, 1], ['1', True], ERR_FLOAT),
+]
+
+EMPTY_RESPONSE = Response('', 201)
+EMPTY_RESPONSE_TYP = [{'status_code': [201], 'schema': None}]
+
+# (matcher, status code, matches)
+STATUS_CODE_CASES = [
+    ('4XX', 404, True),
+    ('4XX', 504, False),
+    ('4XX', 4040, False),
+    ('20X', 204, True),
+    ('20X', 214, False),
+    (404, 404, True),
+    (404, 401, False),
+    ((500, 599), 503, True),
+    ('2XX', '201', True),
+    (201, '201 CREATED', True),
+    ('4XX', '201', False),
+    (201, 'CREATED', False),
+]
+
+STRING4 = ((T_STRING, 4), False)
+I32 = (T_I32, False)
+FLOAT = (T_FLOAT, False)
+USER_TYP = {"name": STRING4, "id": I32}
+
+HUNDRED_NONES = [None] * 100
+MANY_NONES = [None] * 10000
+U8_NULLABLE_ELLIPSIS = [(T_U8, True), S_ELLIPSIS]
 
 
 class TestParser(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        # Parse docstring schemas of tests once, bad schemas are parsed inline
+        cls._schemas = {}
+        for name, attr in vars(cls).items():
+            doc = getattr(attr, '__doc__', None)
+            if name.startswith('test_') and not name.startswith('test_bad_') \
+                    and doc and doc.startswith('Schema'):
+                cls._schemas[name] = m.parse(inspect.cleandoc(doc))
+
     def test_simple(self):
         """Schema::
 
@@ -33,36 +207,18 @@ class TestParser(unittest.TestCase):
             4XX/5XX
             {"message": string}
         """
-        schema = m.parse(self.test_simple.__doc__)
-        assert schema == {
-            'request': {
-                'route': ['/item', {}],
-                'methods': [m.M_POST, m.M_PUT],
-                'schema': {
-                    'name': ((m.T_STRING, None), False),
-                    'number': (m.T_I16, False),
-                    'children': ([({'id': (m.T_I32, False)}, False),
-                                  m.S_ELLIPSIS], False)
-                },
-            },
-            'responses': [
-                {'status_code': [200],
-                 'schema': {
-                     'id': (m.T_I32, False),
-                     'name': ((m.T_STRING, None), False),
-                     'number': (m.T_I16, False),
-                     'children': ([({'id': (m.T_I32, False)}, False),
-                                   m.S_ELLIPSIS], False)
-                 }},
-                {'status_code': ['4XX', '5XX'],
-                 'schema': {'message': ((m.T_STRING, None), False)}}
-            ]
-        }
+        self.assertEqual(self._schemas['test_simple'], EXPECTED_SIMPLE)
 
     def test_empty(self):
         assert m.parse(None) is None
         assert m.parse('test') is None
 
+    def test_parse_memoized(self):
+        doc = self.test_simple.__doc__
+        self.assertEqual(m.parse(doc), EXPECTED_SIMPLE)  # Indented as written
+        assert m.parse(doc) is m.parse(doc)
+        assert m.parse(doc) is m.parse(''.join(list(doc)))
+
     def test_string_escape(self):
         """Schema::
 
@@ -70,25 +226,38 @@ class TestParser(unittest.TestCase):
             {"specialkey\\"\\t\\r": i8}
             200/4XX/5XX
         """
-        schema = m.parse(self.test_string_escape.__doc__)
-        assert schema['request']['schema'] == {
-            'specialkey"\t\r': (m.T_I8, False),
-        }
+        schema = self._schemas['test_string_escape']
+        self.assertEqual(schema['request']['schema'], {
+            'specialkey"\t\r': (T_I8, False),
+        })
+
+    def test_options_method(self):
+        schema = m.parse_schema('OPTIONS/GET /users\n200')
+        assert schema['request']['methods'] == [M_OPTIONS, M_GET]
+
+    def test_shared_leaf_types(self):
+        schema = m.parse_schema(
+            'GET /\n{"a": string, "b": string}\n200\n[string(3), string(3)]')
+        req, resp = schema['request']['schema'], schema['responses'][0]
+        assert req['a'][0] is req['b'][0]
+        assert resp['schema'][0][0] is resp['schema'][1][0]
+
+    def test_bad_string_escape(self):
+        """Schema::
+
+            POST /user
+            {"key\\x": i8}
+            200
+        """
+        with self.assertRaises(m._InternalLexerError):
+            m.parse(self.test_bad_string_escape.__doc__)
 
     def test_no_content(self):
         """Schema::
             GET /user/<i32:id>
             201
         """
-        schema = m.parse(self.test_no_content.__doc__)
-        assert schema == {
-            'request': {
-                'route': ['/user/<id>', {'id': m.T_I32}],
-                'methods': [m.M_GET],
-                'schema': None,
-            },
-            'responses': [{'status_code': [201], 'schema': None}]
-        }
+        self.assertEqual(self._schemas['test_no_content'], EXPECTED_NO_CONTENT)
 
     def test_alternative_schema_sign(self):
         """Schema:
@@ -101,19 +270,8 @@ class TestParser(unittest.TestCase):
                 "name": string(33)
             }
         """
-        schema = m.parse(self.test_alternative_schema_sign.__doc__)
-        assert schema == {
-            'request': {
-                'route': ['/user/<id>', {'id': m.T_I32}],
-                'methods': [m.M_GET],
-                'schema': None,
-            },
-            'responses': [
-                {'status_code': [200],
-                 'schema': {'id': (m.T_I32, False), 'name': ((m.T_STRING, 33),
-                                                             False)}}
-            ],
-        }
+        self.assertEqual(self._schemas['test_alternative_schema_sign'],
+                         EXPECTED_ALTERNATIVE_SCHEMA_SIGN)
 
     def test_schema_array(self):
         """Schema:
@@ -124,20 +282,8 @@ class TestParser(unittest.TestCase):
                 ...
             ]
         """
-        schema = m.parse(self.test_schema_array.__doc__)
-        assert schema == {
-            'request': {
-                'route': ['/users', {}],
-                'methods': [m.M_GET],
-                'schema': None,
-            },
-            'responses': [
-                {'status_code': [200],
-                 'schema': [({'id': (m.T_I32, False), 'name': (
-                     (m.T_STRING, 32),
-                     False)}, False), m.S_ELLIPSIS]}
-            ]
-        }
+        self.assertEqual(self._schemas['test_schema_array'],
+                         EXPECTED_SCHEMA_ARRAY)
 
     def test_bad_status_code_matcher(self):
         """Schema::
@@ -157,22 +303,8 @@ class TestParser(unittest.TestCase):
             {"name": string(33)*}
             201
         """
-        schema = m.parse(self.test_nullable_schema.__doc__)
-        assert schema == {
-            'request': {
-                'methods': [m.M_GET],
-                'route': ['/users', {}],
-                'schema': {
-                    'name': ((m.T_STRING, 33), True)
-                }
-            },
-            'responses': [
-                {
-                    'status_code': [201],
-                    'schema': None
-                }
-            ]
-        }
+        self.assertEqual(self._schemas['test_nullable_schema'],
+                         EXPECTED_NULLABLE_SCHEMA)
 
     def test_empty_response(self):
         """Schema::
@@ -182,259 +314,517 @@ class TestParser(unittest.TestCase):
             4XX/5XX
             {"error": string}
         """
-        schema = m.parse(self.test_empty_response.__doc__)
-        assert schema == {'request': {'methods': [4],
-                                      'route': ['/user/<id>', {'id': 8}],
-                                      'schema': None},
-                          'responses': [{'schema': None, 'status_code': [201]},
-                                        {'schema': {'error': ((11, None),
-                                                              False)},
-                                         'status_code': ['4XX', '5XX']}]}
-
-
-class TestValidation(unittest.TestCase):
-
-    def test_validate_bool(self):
-        assert m.validate_bool(True, None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_bool(1, None)
-        assert exc.exception.code == m.ErrInvalidBool[0]
-
-    def test_validate_u8(self):
-        assert m.validate_u8(199, None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_u8(1999, None)
-        assert exc.exception.code == m.ErrInvalidU8[0]
-
-    def test_validate_u16(self):
-        assert m.validate_u16(65535, None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_u16(65535*2, None)
-        assert exc.exception.code == m.ErrInvalidU16[0]
-
-    def test_validate_u32(self):
-        assert m.validate_u32(4294967295, None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_u32(4294967296, None)
-        assert exc.exception.code == m.ErrInvalidU32[0]
-
-    def test_validate_u64(self):
-        assert m.validate_u64(0xffffffffffffffff, None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_u64(0xffffffffffffffff + 1, None)
-        assert exc.exception.code == m.ErrInvalidU64[0]
-
-    def test_validate_float(self):
-        assert m.validate_float(0.1, None) is None
-        assert m.validate_float(1, None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_float('1', None)
-        assert exc.exception.code == m.ErrInvalidFloat[0]
+        self.assertEqual(self._schemas['test_empty_response'],
+                         EXPECTED_EMPTY_RESPONSE)
+
+    def test_long_sequences(self):
+        n = 5000
+        fields = ',\n    '.join('"key%d": u8' % i for i in range(n))
+        values = ', '.join(['i8'] * n)
+        data = 'Schema::\n    POST /\n    {%s}\n    200\n    [%s]\n' % (
+            fields, values)
+        schema = m.parse(data)
+        assert len(schema['request']['schema']) == n
+        self.assertEqual(schema['responses'][0]['schema'], [(T_I8, False)] * n)
+
+    def test_parse_from_func_cached(self):
+        def view():
+            """Schema::
+                GET /users
+                201
+            """
+        schema = m.parse_from_func(view)
+        assert schema is not None
+        assert m.parse_from_func(view) is schema
+        del view
+        assert not [f for f, _ in m._SCHEMA_CACHE.values() if f() is None]
+
+    def test_parse_from_func_shared_doc(self):
+        def view1():
+            """Schema::
+                GET /users
+                200
+            """
+
+        def view2():
+            pass
+        view2.__doc__ = view1.__doc__
+        assert m.parse_from_func(view1) is m.parse_from_func(view2)
+
+    def test_parse_from_func_no_schema(self):
+        def view():
+            """Get users."""
+        assert m.parse_from_func(view) is None
+        assert m.parse_from_func(view) is None
+
+
+class ValidationTestCase(unittest.TestCase):
+
+    def _assertErr(self, code, fn, *args, **kwargs):
+        """Assert ``fn(*args, **kwargs)`` raises a ``ValidationError`` with
+        error ``code`` (or any code in a frozenset), returns the error.
+        Keyword ``msg`` is not passed to ``fn`` but shown on failure.
+        """
+        msg = kwargs.pop('msg', None)
+        try:
+            fn(*args, **kwargs)
+        except m.ValidationError as exc:
+            if isinstance(code, frozenset):
+                self.assertIn(exc.code, code, msg)
+            else:
+                self.assertEqual(exc.code, code, msg)
+            return exc
+        self.fail('ValidationError not raised' +
+                  ('' if msg is None else ': %r' % (msg,)))
+
+
+class TestValidation(ValidationTestCase):
+
+    def test_validate_scalars(self):
+        for fn, vals_ok, vals_bad, err in SCALAR_CASES:
+            for val in vals_ok:
+                assert fn(val, None) is None, (fn.__name__, val)
+            for val in vals_bad:
+                self._assertErr(err, fn, val, None, msg=(fn.__name__, val))
+
+    def test_validate_unsigned_negative(self):
+        for fn in (m.validate_u8, m.validate_u16, m.validate_u32,
+                   m.validate_u64):
+            self._assertErr(UNSIGNED_ERRS, fn, -1, None)
 
     def test_validate_string(self):
-        assert m.validate_string('test', (m.T_STRING, None), None) is None
-        assert m.validate_string('test', (m.T_STRING, 4), None) is None
-        assert m.validate_string(u'unicode', (m.T_STRING, None), None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_string(1, (m.T_STRING, None), None)
-        assert exc.exception.code == m.ErrInvalidString[0]
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_string("test", (m.T_STRING, 3), None)
-        assert exc.exception.code == m.ErrInvalidString[0]
+        assert m.validate_string('test', (T_STRING, None), None) is None
+        assert m.validate_string('test', (T_STRING, 4), None) is None
+        assert m.validate_string(u'unicode', (T_STRING, None), None) is None
+        self._assertErr(ERR_STRING, m.validate_string, 1,
+                        (T_STRING, None), None)
+        self._assertErr(ERR_STRING, m.validate_string, "test",
+                        (T_STRING, 3), None)
 
     def test_validate_type(self):
-        assert m.validate_type(18, m.T_I8, None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_type(1888, m.T_I8, None)
-        assert exc.exception.code == m.ErrInvalidI8[0]
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_type(19, (m.T_STRING, 31), None)
-        assert exc.exception.code == m.ErrInvalidString[0]
-        assert m.validate_type('abc', (m.T_STRING, 3), None) is None
+        assert m.validate_type(18, T_I8, None) is None
+        self._assertErr(ERR_I8, m.validate_type, 1888, T_I8, None)
+        self._assertErr(ERR_STRING, m.validate_type, 19,
+                        (T_STRING, 31), None)
+        assert m.validate_type('abc', (T_STRING, 3), None) is None
+
+    @unittest.skipUnless(os.environ.get('DOCJSON_BENCH'), 'benchmark')
+    def test_validate_type_bulk(self):
+        start = default_timer()
+        for _ in range(10000):
+            m.validate_type(18, T_I8, None)
+            m.validate_type('abc', (T_STRING, 3), None)
+        assert default_timer() - start < 1
+
+    def test_validate_json_None(self):
+        val_bad = {'key': 'val'}
+        assert m.validate_json(None, None, None) is None
+        self._assertErr(ERR_SHOULD_BE_NULL, m.validate_json, val_bad, None,
+                        None)
+
+    def test_validate_bad_typ(self):
+        val = {'key': 'val'}
+        self._assertErr(ERR_JSON, m.validate_json, val, 1, None)
+
+    def test_validation_error_key(self):
+        typ = {"items": ([({"id": I32}, False), S_ELLIPSIS], False)}
+        exc = self._assertErr(ERR_I32, m.validate_json,
+                              {"items": [{"id": 1}, {"id": "2"}]}, typ, None,
+                              key='')
+        assert exc.key == '.items[1].id'
+
+    def test_validation_error_pickle(self):
+        exc = self._assertErr(ERR_I32, m.validate_response,
+                              {'id': '1'}, [{'status_code': [200],
+                                             'schema': {'id': I32}}])
+        copy = pickle.loads(pickle.dumps(exc))
+        assert type(copy) is m.ResponseValidationError
+        assert (copy.code, copy.reason, copy.key, copy.value) == \
+            (exc.code, exc.reason, '.id', '1')
+
+    def test_compile_json(self):
+        fn = m.compile_json([(T_U8, False), S_ELLIPSIS])
+        assert fn([1, 2, 3], None) is None
+        self._assertErr(ERR_U8, fn, [1, 2, 256], None)
+        self._assertErr(ERR_NULLABLE, fn, None, None)
+
+    def test_compile_type_shared(self):
+        typ1 = [({'id': (T_I32, False)}, False), S_ELLIPSIS]
+        typ2 = {'item': ({'id': (T_I32, False)}, False)}
+        fn = m.compile_type({'id': (T_I32, False)})
+        assert m.compile_type(typ1) is m.compile_type(list(typ1))
+        assert m.compile_type(typ2) is not fn
+        assert m.compile_type({'id': (T_I32, True)}) is not fn
+        assert m.compile_type({'id': (T_I32, False)}) is fn
+
+    def test_validate_method(self):
+        assert m.validate_method('POST', [M_POST], None) is None
+        assert m.validate_method('POST', [M_POST, M_PUT], None) is None
+        assert m.validate_method('GET', frozenset([M_GET]), None) is None
+        self._assertErr(ERR_METHOD, m.validate_method, 'GET', [M_POST],
+                        None)
+        mask = m.compile_methods([M_POST, M_PUT])
+        assert m.validate_method('PUT', mask, None) is None
+        for method in ('GET', 'TRACE'):
+            self._assertErr(ERR_METHOD, m.validate_method, method, mask,
+                            None)
+
+    def test_validate_route(self):
+        val_ok = {'id': 123}
+        val_bad = {'id': 1234}
+        typ = ['/<id>', {'id': T_U8}]
+        assert m.validate_route(val_ok, typ, None) is None
+        self._assertErr(ERR_U8, m.validate_route, val_bad, typ, None)
+
+    def test_validate_route_var_not_found(self):
+        typ = ['/<id>/<name>', {'id': T_U8, 'name': None}]
+        assert m.validate_route({'id': 1, 'name': 'x'}, typ, None) is None
+        self._assertErr(ERR_ROUTE_VAR_NOT_FOUND, m.validate_route, {'id': 1},
+                        typ, None)
+
+    def test_validate_route_string(self):
+        val_ok = {'arg': 'string'}
+        val_bad = {'arg': 'long string'}
+        typ = ['/<arg>', {'arg': (T_STRING, 6)}]
+        assert m.validate_route(val_ok, typ, None) is None
+        self._assertErr(ERR_STRING, m.validate_route, val_bad, typ, None)
+
+    def test_match_status_code(self):
+        for matcher, code, expected in STATUS_CODE_CASES:
+            assert bool(m.match_status_code(matcher, code)) is expected, \
+                (matcher, code)
+        assert m.compile_status_code('5XX') == (500, 599)
+        assert m.compile_status_code('20X') == (200, 209)
+
+    def test_validate_empty_string_response(self):
+        assert m.validate_response(EMPTY_RESPONSE, EMPTY_RESPONSE_TYP) is None
+        assert m.validate_response(('', 201), EMPTY_RESPONSE_TYP) is None
+
+    def test_validate_response_status_code_matchers(self):
+        error_typ = {'error': ((T_STRING, None), False)}
+        typ = [{'status_code': ['4XX'], 'schema': error_typ},
+               {'status_code': [200, 201], 'schema': None}]
+        assert m.validate_response(('', 201), typ) is None
+        assert m.validate_response(('{"error": "x"}', 404), typ) is None
+        val_bad = ('{"error": 1}', 404)
+        exc = self._assertErr(ERR_STRING, m.validate_response, val_bad, typ)
+        assert isinstance(exc, m.ResponseValidationError)
+        exc = self._assertErr(ERR_RESPONSE, m.validate_response,
+                              ('', 500), typ)
+        assert isinstance(exc, m.ResponseValidationError)
+
+    def test_validate_response_overlapping_matchers(self):
+        typ = [{'status_code': ['2XX'],
+                'schema': {'a': ((T_STRING, None), False)}},
+               {'status_code': [200],
+                'schema': {'b': ((T_STRING, None), False)}}]
+        assert m.validate_response(Response('{"a": "x"}', 200), typ) is None
+        assert m.validate_response(('{"a": "x"}', 201), typ) is None
+        self._assertErr(ERR_UNEXPECTED_KEY, m.validate_response,
+                        Response('{"b": "x"}', 200), typ)
+        typ = [{'status_code': ['2XX'], 'schema': None}] + typ[1:]
+        assert m.validate_response(('{"b": "x"}', 200), typ) is None
+        assert m.validate_response(('', 200), typ) is None
+
+    def test_validate_response_string_status_code(self):
+        typ = [{'status_code': [201], 'schema': {'id': I32}},
+               {'status_code': ['4XX'], 'schema': None}]
+        for val in (('{"id": 1}', '201'), ('{"id": 1}', '201 CREATED'),
+                    ('', '404'), ('', '404 NOT FOUND')):
+            assert m.validate_response(val, typ) is None, val
+        for val in (('{"id": 1}', '200'), ('', 'NOT FOUND'), ('', '')):
+            self._assertErr(ERR_RESPONSE, m.validate_response, val, typ)
+
+    def test_validate_response_headers_without_status(self):
+        typ = [{'status_code': [200, '4XX'], 'schema': None}]
+        for headers in ({'X-A': 'b'}, [('X-A', 'b')]):
+            exc = self._assertErr(ERR_RESPONSE, m.validate_response,
+                                  ('', headers), typ)
+            assert isinstance(exc, m.ResponseValidationError)
+
+    def test_validate_unserialized_response(self):
+        typ = [{'status_code': [200, 400],
+                'schema': {'id': I32}}]
+        assert m.validate_response({'id': 1}, typ) is None
+        assert m.validate_response(({'id': 1}, 400), typ) is None
+        exc = self._assertErr(ERR_I32, m.validate_response,
+                              {'id': '1'}, typ)
+        assert isinstance(exc, m.ResponseValidationError)
+
+    def test_validate_unserialized_response_non_native(self):
+        typ = [{'status_code': [200],
+                'schema': {'items': ([I32, S_ELLIPSIS], False)}}]
+        assert m.validate_response({'items': (1, 2)}, typ) is None
+        assert m.validate_response(({'items': (1, 2)}, 200), typ) is None
+        exc = self._assertErr(ERR_I32, m.validate_response,
+                              {'items': (1, '2')}, typ)
+        assert exc.key == '.items[1]'
+        self._assertErr(ERR_RESPONSE, m.validate_response,
+                        {'items': object()}, typ)
+
+    def _check_response_json_loader(self, loader, nan_ok):
+        typ = [{'status_code': [200], 'schema': {'id': FLOAT}}]
+        json_loads = m.json_loads
+        m.json_loads = loader
+        try:
+            assert m.validate_response(('{"id": 1.5}', 200), typ) is None
+            for val in (('{"id": ', 200), (b'{bad', 200), (b'\xff', 200),
+                        (1, 200), Response('{bad', 200)):
+                exc = self._assertErr(ERR_RESPONSE, m.validate_response,
+                                      val, typ)
+                assert isinstance(exc, m.ResponseValidationError)
+            val = ('{"id": NaN}', 200)
+            if nan_ok:
+                assert m.validate_response(val, typ) is None
+            else:
+                self._assertErr(ERR_RESPONSE, m.validate_response, val, typ)
+        finally:
+            m.json_loads = json_loads
+
+    def test_validate_response_json_stdlib(self):
+        self._check_response_json_loader(json.loads, True)
+
+    @unittest.skipUnless(m.orjson, 'orjson not installed')
+    def test_validate_response_json_orjson(self):
+        self._check_response_json_loader(m.orjson.loads, False)
+
+    def test_validate_no_content_response(self):
+        typ = [{'status_code': [204], 'schema': None}]
+        assert m.validate_response(Response(status=204), typ) is None
+        for val_bad in (Response('{}', status=204),
+                        Response(iter([b'{}']), status=204)):
+            exc = self._assertErr(ERR_RESPONSE, m.validate_response, val_bad,
+                                  typ)
+            assert isinstance(exc, m.ResponseValidationError)
+
+
+class TestValidationArray(ValidationTestCase):
+
+    USERS = [{"name": 'jack', "id": 32},
+             {"name": 'chao', "id": 33},
+             {"name": 'ming', "id": 34}]
 
     def test_validate_array_case_simple_1(self):
         val_ok = [1, 2, 3, 4, 5]
         val_bad = [1, 2, 3, 4, 256]
-        typ = [(m.T_U8, False), m.S_ELLIPSIS]
+        typ = [(T_U8, False), S_ELLIPSIS]
         assert m.validate_array(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError) as exc:
-            m.validate_array(val_bad, typ, None)
-        assert exc.exception.code == m.ErrInvalidU8[0]
+        exc = self._assertErr(ERR_U8, m.validate_array, val_bad, typ,
+                              None)
+        assert exc.key == '[4]'
+
+    def test_validate_array_integer_tail(self):
+        typ = [(T_I8, False), (T_U8, False), S_ELLIPSIS]
+        assert m.validate_array([-1] + list(range(256)), typ, None) is None
+        for val_bad, err, key in (([-1, 1, True], ERR_U8, '[2]'),
+                                  ([-1, 1, 2.0], ERR_U8, '[2]'),
+                                  ([-1, 1, None], ERR_NULLABLE, '[2]'),
+                                  ([-1, -1], ERR_U8, '[1]'),
+                                  ([-129, 1], ERR_I8, '[0]')):
+            exc = self._assertErr(err, m.validate_array, val_bad, typ, None)
+            assert exc.key == key
 
     def test_validate_array_case_simple_2(self):
         val_ok = ["abc", "efg", "hij"]
         val_bad = ["abc", "efg", "hijopq"]
-        typ = [((m.T_STRING, 3), False), m.S_ELLIPSIS]
+        typ = [((T_STRING, 3), False), S_ELLIPSIS]
         assert m.validate_array(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_array(val_bad, typ, None)
+        self._assertErr(ERR_STRING, m.validate_array, val_bad, typ, None)
 
     def test_validate_array_complex_1(self):
         val_ok = [1, 256, 3, 255]
         val_bad = [1, 256, 3, 256]
-        typ = [(m.T_U8, False), (m.T_U32, False), (m.T_U8, False),
-               m.S_ELLIPSIS]
+        typ = [(T_U8, False), (T_U32, False), (T_U8, False),
+               S_ELLIPSIS]
         assert m.validate_array(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_array(val_bad, typ, None)
+        self._assertErr(ERR_U8, m.validate_array, val_bad, typ, None)
 
     def test_validate_array_complex_2(self):
-        val_ok = [{"name": 'jack', "id": 32},
-                  {"name": 'chao', "id": 33},
-                  {"name": 'ming', "id": 34},
-                  ]
-        val_bad = [{"name": 'jack', "id": 32},
-                   {"name": 'chao-wang', "id": 33},
-                   {"name": 'ming', "id": 34},
-                   ]
-        typ = [({"name": ((m.T_STRING, 4), False), "id": (m.T_I32, False)},
-                False),
-               m.S_ELLIPSIS]
-        assert m.validate_array(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_array(val_bad, typ, None)
+        typ = [(USER_TYP, False), S_ELLIPSIS]
+        for val in ([], self.USERS, self.USERS * 2):
+            assert m.validate_array(val, typ, None) is None
+        for val, err in (
+                ([self.USERS[0], {"name": 'chao-wang', "id": 33}],
+                 ERR_STRING),
+                ([self.USERS[0], {"name": 'chao', "id": '33'}], ERR_I32)):
+            self._assertErr(err, m.validate_array, val, typ, None)
 
     def test_validate_array_no_ellipsis(self):
-        val_ok = [{"name": 'jack', "id": 32},
-                  {"name": 'chao', "id": 33}]
-        val_bad = [{"name": 'jack', "id": 32},
-                   {"name": 'chao', "id": 33},
-                   {"name": 'ming', "id": 34},
-                   ]
-        typ = [({"name": ((m.T_STRING, 4), False), "id": (m.T_I32, False)},
-                False),
-               ({"name": ((m.T_STRING, 4), False), "id": (m.T_I32, False)},
-                False)]
-        assert m.validate_array(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_array(val_bad, typ, None)
+        typ = [(USER_TYP, False), (USER_TYP, False)]
+        assert m.validate_array(self.USERS[:2], typ, None) is None
+        for val, err in (([], ERR_NOT_ENOUGH),
+                         (self.USERS[:1], ERR_NOT_ENOUGH),
+                         (self.USERS, ERR_ARRAY_LENGTH)):
+            self._assertErr(err, m.validate_array, val, typ, None)
 
     def test_validate_array_nested(self):
         val_ok = [{"child": [15, 16, 17]}, {"child": [25, 26, 37]}]
         val_bad = [{"child": [15, 16, 17]}, {"child": [25, 266, 37]}]
-        typ = [({"child": ([(m.T_U8, False), m.S_ELLIPSIS], False)}, False),
-               m.S_ELLIPSIS]
+        typ = [({"child": ([(T_U8, False), S_ELLIPSIS], False)}, False),
+               S_ELLIPSIS]
         assert m.validate_array(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_array(val_bad, typ, None)
+        exc = self._assertErr(ERR_U8, m.validate_array, val_bad, typ, None)
+        assert exc.key == '[1].child[1]'
 
     def test_validate_array_ellipsis_empty_val_1(self):
         val = []
-        typ = [(m.T_U8, False), m.S_ELLIPSIS]
+        typ = [(T_U8, False), S_ELLIPSIS]
         assert m.validate_array(val, typ, None) is None
 
     def test_validate_array_ellipsis_empty_val_2(self):
         val = [1]
-        typ = [(m.T_U8, False), (m.T_U8, False), m.S_ELLIPSIS]
+        typ = [(T_U8, False), (T_U8, False), S_ELLIPSIS]
+        assert m.validate_array(val, typ, None) is None
+
+    def test_array_nullable_element_1(self):
+        val_ok = [1, None, 2, None]
+        val_bad = [1, None, None, None]
+        typ = [(T_U8, False), (T_U8, True), (T_U8, False), (T_U8, True)]
+        assert m.validate_array(val_ok, typ, None) is None
+        self._assertErr(ERR_NULLABLE, m.validate_array, val_bad, typ, None)
+
+    def test_array_nullable_element_2(self):
+        assert m.validate_array(HUNDRED_NONES, U8_NULLABLE_ELLIPSIS,
+                                None) is None
+
+    def test_array_nullable_element_large(self):
+        assert m.validate_array(MANY_NONES, U8_NULLABLE_ELLIPSIS,
+                                None) is None
+        val_bad = MANY_NONES + [256]
+        exc = self._assertErr(ERR_U8, m.validate_array, val_bad,
+                              U8_NULLABLE_ELLIPSIS, None)
+        assert exc.key == '[%d]' % len(MANY_NONES)
+
+    @unittest.skipUnless(os.environ.get('DOCJSON_BENCH'), 'benchmark')
+    def test_array_nullable_element_bench(self):
+        val = [None] * 100000
+        start = default_timer()
+        m.validate_array(val, U8_NULLABLE_ELLIPSIS, None)
+        assert default_timer() - start < 0.5
+
+    def test_array_ellipsis_only(self):
+        typ = [S_ELLIPSIS]
+        val = [1, 2, 3]
         assert m.validate_array(val, typ, None) is None
 
+
+class TestValidationObject(ValidationTestCase):
+
     def test_validate_object(self):
         val_ok = {"name": "abcd", "id": 1}
         val_bad = {"name": "abcdefg", "id": 111111111}
-        typ = {"name": ((m.T_STRING, 4), False), "id": (m.T_I32, False)}
-        assert m.validate_object(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_object(val_bad, typ, None)
+        assert m.validate_object(val_ok, USER_TYP, None) is None
+        self._assertErr(ERR_STRING, m.validate_object, val_bad, USER_TYP,
+                        None)
 
     def test_validate_object_nested(self):
         val_ok = {"name": {"name": {"name": "hello world"}}}
         val_bad = {"name": {"name": {"name": "hello world!"}}}
-        typ = {"name": ({"name": ({"name": ((m.T_STRING, 11), False)}, False)},
+        typ = {"name": ({"name": ({"name": ((T_STRING, 11), False)}, False)},
                         False)}
         assert m.validate_object(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_object(val_bad, typ, None)
+        exc = self._assertErr(ERR_STRING, m.validate_object, val_bad, typ,
+                              None)
+        assert exc.key == '.name.name.name'
 
     def test_validate_object_not_exist_keys_1(self):
         val_ok = {"name": "name", "value": "value"}
         val_bad = {"name": "name"}
         val_bad2 = {"name": "name", "value": "value", "value2": "value2"}
-        typ = {"name": ((m.T_STRING, None), False),
-               "value": ((m.T_STRING, None), False)}
+        typ = {"name": ((T_STRING, None), False),
+               "value": ((T_STRING, None), False)}
         assert m.validate_object(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_object(val_bad, typ, None)
-        with self.assertRaises(m.ValidationError):
-            m.validate_object(val_bad2, typ, None)
+        self._assertErr(ERR_KEY_NOT_FOUND, m.validate_object, val_bad, typ,
+                        None)
+        self._assertErr(ERR_UNEXPECTED_KEY, m.validate_object, val_bad2, typ,
+                        None)
+
+    def test_validate_object_key_errors(self):
+        typ = {"name": ((T_STRING, None), False),
+               "value": ((T_STRING, None), True)}
+        exc = self._assertErr(ERR_KEY_NOT_FOUND, m.validate_object,
+                              {"value": None}, typ, None)
+        assert exc.key == '.name'
+        exc = self._assertErr(ERR_UNEXPECTED_KEY, m.validate_object,
+                              {"name": "a", "other": 1}, typ, None)
+        assert exc.key == '.other'
 
     def test_validate_object_not_exist_keys_2(self):
         val_ok = {"name": "name", "value": "value"}
         val_ok2 = {"name": "name", "value": "value", "value2": "value2"}
-        typ = {"name": ((m.T_STRING, None), False),
-               "value": ((m.T_STRING, None), False), m.S_ELLIPSIS: None}
+        typ = {"name": ((T_STRING, None), False),
+               "value": ((T_STRING, None), False), S_ELLIPSIS: None}
         assert m.validate_object(val_ok, typ, None) is None
         assert m.validate_object(val_ok2, typ, None) is None
 
     def test_validate_object_nullable_key_can_not_exist(self):
         val_ok = {"name": "name"}
         val_bad = {"value": "value"}
-        typ = {"name": ((m.T_STRING, None), False),
-               "value": ((m.T_STRING, None), True)}
+        typ = {"name": ((T_STRING, None), False),
+               "value": ((T_STRING, None), True)}
         assert m.validate_object(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_object(val_bad, typ, None)
-
-    def test_array_nullable_element_1(self):
-        val_ok = [1, None, 2, None]
-        val_bad = [1, None, None, None]
-        typ = [(m.T_U8, False), (m.T_U8, True), (m.T_U8, False), (m.T_U8,
-                                                                  True)]
-        assert m.validate_array(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_array(val_bad, typ, None)
-
-    def test_array_nullable_element_2(self):
-        val = [None] * 100
-        typ = [(m.T_U8, True), m.S_ELLIPSIS]
-        assert m.validate_array(val, typ, None) is None
-
-    def test_array_ellipsis_only(self):
-        typ = [m.S_ELLIPSIS]
-        val = [1, 2, 3]
-        assert m.validate_array(val, typ, None) is None
-
-    def test_validate_json_None(self):
-        assert m.validate_json(None, None, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_json({'key': 'val'}, None, None)
-
-    def test_validate_bad_typ(self):
-        with self.assertRaises(m.ValidationError):
-            m.validate_json({'key': 'val'}, 1, None)
-
-    def test_validate_method(self):
-        assert m.validate_method('POST', [m.M_POST], None) is None
-        assert m.validate_method('POST', [m.M_POST, m.M_PUT], None) is None
-
-    def test_validate_route(self):
-        val_ok = {'id': 123}
-        val_bad = {'id': 1234}
-        typ = ['/<id>', {'id': m.T_U8}]
-        assert m.validate_route(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_route(val_bad, typ, None)
-
-    def test_validate_route_string(self):
-        val_ok = {'arg': 'string'}
-        val_bad = {'arg': 'long string'}
-        typ = ['/<arg>', {'arg': (m.T_STRING, 6)}]
-        assert m.validate_route(val_ok, typ, None) is None
-        with self.assertRaises(m.ValidationError):
-            m.validate_route(val_bad, typ, None)
-
-    def test_match_status_code(self):
-        assert m.match_status_code('4XX', 404)
-        assert not m.match_status_code('4XX', 504)
-        assert m.match_status_code(404, 404)
-        assert not m.match_status_code(404, 401)
-
-    def test_validate_empty_string_response(self):
-        assert m.validate_response(Response('', 201), [{'status_code': [201],
-                                                        'schema': None}]) is \
-            None
-        assert m.validate_response(('', 201), [{'status_code': [201],
-                                                'schema': None}]) is \
-            None
+        self._assertErr(ERR_KEY_NOT_FOUND, m.validate_object, val_bad, typ,
+                        None)
+
+
+class TestValidate(ValidationTestCase):
+
+    def setUp(self):
+        app = Flask(__name__)
+        app.testing = True
+
+        @app.route('/user/<int:id>', methods=['GET', 'PUT'])
+        @m.validate
+        def user(id):
+            """Schema::
+
+                GET/PUT /user/<u8:id>
+                200
+                {"id": i32}
+            """
+            return jsonify(id=id)
+
+        @app.route('/item', methods=['POST'])
+        @m.validate
+        def item():
+            """Schema::
+
+                POST /item
+                {"id": i32}
+                200
+                {"id": i32}
+            """
+            return jsonify(id=1)
+
+        self.app = app
+        self.client = app.test_client()
+
+    def test_get(self):
+        assert self.client.get('/user/1').status_code == 200
+
+    def test_invalid_route_var(self):
+        exc = self._assertErr(ERR_U8, self.client.get, '/user/256')
+        assert isinstance(exc, m.RequestValidationError)
+
+    def test_unexpected_request_json(self):
+        exc = self._assertErr(ERR_SHOULD_BE_NULL, self.client.put, '/user/1',
+                              json={'id': 1})
+        assert isinstance(exc, m.RequestValidationError)
+
+    def test_malformed_request_json(self):
+        for method, url in (('PUT', '/user/1'), ('POST', '/item')):
+            resp = self.client.open(url, method=method, data='{bad',
+                                    content_type='application/json')
+            assert resp.status_code == 400, url
+        assert self.client.post('/item', json={'id': 1}).status_code == 200
+        exc = self._assertErr(ERR_NULLABLE, self.client.post, '/item',
+                              content_type='application/json')
+        assert isinstance(exc, m.RequestValidationError)
+
+    def test_register_all_skips_validated(self):
+        view = self.app.view_functions['user']
+        m.register_all(self.app)
+        assert self.app.view_functions['user'] is view
 
 
 if __name__ == '__main__':